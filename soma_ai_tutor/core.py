@@ -1,9 +1,22 @@
+import concurrent.futures
 import datetime
-import json
+import functools
+import hashlib
 import os
+import random
+import re
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+import httpx
+import orjson
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types as genai_types
@@ -14,7 +27,10 @@ BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 DATA_DIR = PROJECT_ROOT / "data"
 NOTES_DIR = DATA_DIR / "notes"
+CACHE_DIR = DATA_DIR / "cache"
+# Legacy JSON store: read once to seed progress.db, never written.
 PROGRESS_FILE = DATA_DIR / "progress.json"
+PROGRESS_DB = DATA_DIR / "progress.db"
 
 DEFAULT_MODELS = [
     "gemini-2.5-flash-lite",
@@ -22,6 +38,79 @@ DEFAULT_MODELS = [
     "gemini-2.0-flash",
 ]
 
+RETRY_ATTEMPTS = 3
+RETRY_MAX_DELAY = 60.0
+RETRYABLE_ERRORS = ("QUOTA_EXHAUSTED", "TIMEOUT")
+
+ERROR_PATTERN = re.compile(
+    r"(?P<NOT_FOUND>404.*?not[_ ]found|not[_ ]found.*?404)"
+    r"|(?P<QUOTA_EXHAUSTED>429|resource_exhausted)"
+    r"|(?P<AUTH>401|unauthenticated|invalid api key)"
+    r"|(?P<PERMISSION>403|permission_denied)"
+    r"|(?P<TIMEOUT>deadline_exceeded|timed out|timeout)",
+    re.IGNORECASE | re.DOTALL,
+)
+ERROR_PRIORITY = ("NOT_FOUND", "QUOTA_EXHAUSTED", "AUTH", "PERMISSION", "TIMEOUT")
+
+RESPONSE_CACHE_SIZE = 512
+MEDIA_CACHE_MAX_ENTRIES = 1024
+
+BATCH_CONCURRENCY = 2
+
+INLINE_UPLOAD_LIMIT = 20 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+ASK_PROMPT_TEMPLATE = (
+    "You are Soma AI, an adaptive learning tutor.\n"
+    "\n"
+    "Difficulty level: {difficulty}\n"
+    "Topic: {topic}\n"
+    "\n"
+    "Explain clearly step-by-step.\n"
+    "Use examples.\n"
+    "Adjust depth based on difficulty.\n"
+    "\n"
+    "Question:\n"
+    "{question}"
+)
+SUMMARIZE_PROMPT_TEMPLATE = (
+    "Convert this into structured bullet notes.\n"
+    "Highlight key ideas, definitions, and examples.\n"
+    "\n"
+    "Text:\n"
+    "{text}"
+)
+QUIZ_PROMPT_TEMPLATE = (
+    "Create 5 university-level quiz questions.\n"
+    "Provide answers at the end.\n"
+    "\n"
+    "Topic: {topic}"
+)
+IMAGE_ANALYSIS_PROMPT = (
+    "Analyze this photo in detail. Describe visible objects, setting, actions, "
+    "text in image, and notable visual cues. Then provide a structured summary."
+)
+AUDIO_TRANSCRIPTION_PROMPT = (
+    "Transcribe this lecture audio faithfully. Then provide:\n"
+    "1) clean transcript,\n"
+    "2) key points,\n"
+    "3) short revision summary,\n"
+    "4) 5 quiz questions."
+)
+
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+}
+
 
 def parse_model_candidates() -> List[str]:
     models_from_list = os.getenv("GEMINI_MODELS", "").strip()
@@ -41,17 +130,42 @@ API_KEY = os.getenv("GOOGLE_API_KEY", "").strip()
 MODEL_CANDIDATES = parse_model_candidates()
 
 NOTES_DIR.mkdir(parents=True, exist_ok=True)
-if not PROGRESS_FILE.exists():
-    PROGRESS_FILE.write_text("{}", encoding="utf-8")
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def build_http_client() -> httpx.Client:
+    return httpx.Client(
+        http2=True,
+        timeout=None,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=60,
+        ),
+    )
 
 
+@functools.lru_cache(maxsize=4096)
 def normalize_topic(topic: str) -> str:
     return " ".join(topic.strip().split()).lower()
 
 
-def load_progress() -> Dict[str, int]:
+_DB_LOCAL = threading.local()
+
+
+def progress_connection() -> sqlite3.Connection:
+    conn = getattr(_DB_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(PROGRESS_DB, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _DB_LOCAL.conn = conn
+    return conn
+
+
+def _read_legacy_progress() -> Dict[str, int]:
     try:
-        raw = json.loads(PROGRESS_FILE.read_text(encoding="utf-8"))
+        raw = orjson.loads(PROGRESS_FILE.read_bytes())
     except Exception:
         raw = {}
 
@@ -67,39 +181,122 @@ def load_progress() -> Dict[str, int]:
     return cleaned
 
 
-def save_progress(data: Dict[str, int]) -> None:
-    PROGRESS_FILE.write_text(json.dumps(data, indent=4), encoding="utf-8")
+def init_progress_db() -> None:
+    is_new = not PROGRESS_DB.exists()
+    conn = progress_connection()
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS progress("
+        "topic TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)"
+    )
+    if not is_new:
+        return
+    legacy = _read_legacy_progress()
+    if not legacy:
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0] == 0:
+            conn.executemany(
+                "INSERT INTO progress(topic, count) VALUES (?, ?)",
+                legacy.items(),
+            )
+
+
+init_progress_db()
 
 
 def pick_mime_type(file_path: Union[Path, str]) -> str:
-    ext = Path(file_path).suffix.lower()
-    image_map = {
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-        ".webp": "image/webp",
-    }
-    audio_map = {
-        ".wav": "audio/wav",
-        ".mp3": "audio/mpeg",
-        ".m4a": "audio/mp4",
-        ".aac": "audio/aac",
-        ".flac": "audio/flac",
-        ".ogg": "audio/ogg",
-    }
-    return image_map.get(ext) or audio_map.get(ext) or "application/octet-stream"
-
-
-def is_api_error_text(text: str) -> bool:
-    return text.startswith("Gemini API Error:")
+    return MIME_TYPES.get(Path(file_path).suffix.lower(), "application/octet-stream")
+
+
+@dataclass(slots=True)
+class GenResult:
+    text: str
+    ok: bool
+    error_code: Optional[str] = None
+
+
+def api_error(detail: str, error_code: str) -> GenResult:
+    return GenResult(text=f"Gemini API Error: {detail}", ok=False, error_code=error_code)
+
+
+def is_api_error_text(result: GenResult) -> bool:
+    return not result.ok
+
+
+class MediaInputError(Exception):
+    pass
+
+
+class DiskCache:
+    def __init__(self, directory: Path, max_entries: int) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.txt"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_entries]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def set(self, key: str, text: str) -> None:
+        tmp_name = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(text)
+            os.replace(tmp_name, self._path(key))
+        except OSError:
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+            return
+        try:
+            self._evict()
+        except OSError:
+            pass
 
 
 class SomaTutor:
     def __init__(self) -> None:
         if not API_KEY:
             raise ValueError("Missing GOOGLE_API_KEY in environment/.env")
-        self.client = genai.Client(api_key=API_KEY)
+        self.client = genai.Client(
+            api_key=API_KEY,
+            http_options=genai_types.HttpOptions(httpx_client=build_http_client()),
+        )
         self.model_candidates = MODEL_CANDIDATES
+        self.media_cache = DiskCache(CACHE_DIR, MEDIA_CACHE_MAX_ENTRIES)
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        self._inflight: Dict[str, "concurrent.futures.Future[GenResult]"] = {}
+        self._inflight_lock = threading.Lock()
+        self._batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
 
     def _extract_text(self, response) -> str:
         if hasattr(response, "text") and response.text:
@@ -110,39 +307,163 @@ class SomaTutor:
             return str(response)
 
     def _is_not_found(self, err: str) -> bool:
-        lower = err.lower()
-        return "404" in lower and ("not_found" in lower or "not found" in lower)
+        return self._classify_error(err) == "NOT_FOUND"
 
     def _classify_error(self, err: str) -> str:
-        lower = err.lower()
-        if self._is_not_found(err):
-            return "NOT_FOUND"
-        if "429" in lower or "resource_exhausted" in lower:
-            return "QUOTA_EXHAUSTED"
-        if "401" in lower or "unauthenticated" in lower or "invalid api key" in lower:
-            return "AUTH"
-        if "403" in lower or "permission_denied" in lower:
-            return "PERMISSION"
-        if "deadline_exceeded" in lower or "timed out" in lower or "timeout" in lower:
-            return "TIMEOUT"
+        found = {match.lastgroup for match in ERROR_PATTERN.finditer(err)}
+        for bucket in ERROR_PRIORITY:
+            if bucket in found:
+                return bucket
         return "ERROR"
 
-    def generate(self, contents: Union[str, List[genai_types.Content]]) -> str:
+    def _retry_delay(self, exc: Exception, attempt: int) -> float:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                return min(RETRY_MAX_DELAY, float(headers.get("Retry-After", "")))
+            except (TypeError, ValueError):
+                pass
+        return min(RETRY_MAX_DELAY, 2**attempt) + random.uniform(0, 1)
+
+    def _on_model_error(self, exc: Exception, attempt: int) -> Tuple[str, Optional[GenResult]]:
+        error_text = str(exc)
+        bucket = self._classify_error(error_text)
+        if bucket == "NOT_FOUND":
+            return "next_model", None
+        if bucket in RETRYABLE_ERRORS and attempt + 1 < RETRY_ATTEMPTS:
+            time.sleep(self._retry_delay(exc, attempt))
+            return "retry", None
+        return "fail", api_error(error_text, bucket)
+
+    def _all_models_failed(self, last_error: str) -> GenResult:
+        return api_error(f"all candidate models failed. Last error: {last_error}", "NOT_FOUND")
+
+    def generate(self, contents: Union[str, List[genai_types.Content]]) -> GenResult:
+        if not isinstance(contents, str):
+            return self._call_models(contents)
+
+        key = self._cache_key(contents)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._call_models(contents)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _call_models(self, contents: Union[str, List[genai_types.Content]]) -> GenResult:
         last_error = ""
         for model_name in self.model_candidates:
-            try:
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=contents,
-                )
-                return self._extract_text(response)
-            except Exception as exc:
-                error_text = str(exc)
-                last_error = f"{model_name}: {error_text}"
-                if self._is_not_found(error_text):
-                    continue
-                return f"Gemini API Error: {error_text}"
-        return f"Gemini API Error: all candidate models failed. Last error: {last_error}"
+            for attempt in range(RETRY_ATTEMPTS):
+                try:
+                    response = self.client.models.generate_content(
+                        model=model_name,
+                        contents=contents,
+                    )
+                    return GenResult(text=self._extract_text(response), ok=True)
+                except Exception as exc:
+                    last_error = f"{model_name}: {exc}"
+                    action, failure = self._on_model_error(exc, attempt)
+                    if action == "next_model":
+                        break
+                    if action == "retry":
+                        continue
+                    return failure
+        return self._all_models_failed(last_error)
+
+    def _cache_key(self, prompt: str) -> str:
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{','.join(self.model_candidates)}:{digest}"
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._response_cache_lock:
+            cached = self._response_cache.get(key)
+            if not cached:
+                return None
+            self._response_cache.move_to_end(key)
+            return cached
+
+    def _cache_put(self, key: str, result: str) -> None:
+        if not result:
+            return
+        with self._response_cache_lock:
+            self._response_cache[key] = result
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+    def generate_cached(self, prompt: str) -> GenResult:
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return GenResult(text=cached, ok=True)
+
+        result = self.generate(prompt)
+        if result.ok:
+            self._cache_put(key, result.text)
+        return result
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        last_error = ""
+        for model_name in self.model_candidates:
+            for attempt in range(RETRY_ATTEMPTS):
+                pieces: List[str] = []
+                try:
+                    for chunk in self.client.models.generate_content_stream(
+                        model=model_name,
+                        contents=prompt,
+                    ):
+                        text = getattr(chunk, "text", None)
+                        if text:
+                            pieces.append(text)
+                            yield text
+                except Exception as exc:
+                    last_error = f"{model_name}: {exc}"
+                    if pieces:
+                        error_text = str(exc)
+                        failure = api_error(error_text, self._classify_error(error_text))
+                        raise RuntimeError(failure.text) from exc
+                    action, failure = self._on_model_error(exc, attempt)
+                    if action == "next_model":
+                        break
+                    if action == "retry":
+                        continue
+                    raise RuntimeError(failure.text) from exc
+                if not pieces:
+                    raise RuntimeError(api_error(f"{model_name} returned no text.", "EMPTY").text)
+                self._cache_put(key, "".join(pieces))
+                return
+        raise RuntimeError(self._all_models_failed(last_error).text)
+
+    def _probe_one(self, model_name: str) -> Tuple[str, str, str]:
+        try:
+            response = self.client.models.generate_content(
+                model=model_name,
+                contents="Reply with exactly: OK",
+            )
+            text = self._extract_text(response).strip()
+            return model_name, "OK", text[:120]
+        except Exception as exc:
+            error_text = str(exc)
+            return model_name, self._classify_error(error_text), error_text[:180]
 
     def check_access(self) -> str:
         lines = ["Gemini access check", "-" * 40]
@@ -156,20 +477,14 @@ class SomaTutor:
             "ERROR": 0,
         }
 
-        for model_name in self.model_candidates:
-            try:
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents="Reply with exactly: OK",
-                )
-                text = self._extract_text(response).strip()
-                statuses["OK"] += 1
-                lines.append(f"[OK] {model_name} -> {text[:120]}")
-            except Exception as exc:
-                error_text = str(exc)
-                bucket = self._classify_error(error_text)
-                statuses[bucket] += 1
-                lines.append(f"[{bucket}] {model_name} -> {error_text[:180]}")
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(self.model_candidates))
+        ) as executor:
+            results = list(executor.map(self._probe_one, self.model_candidates))
+
+        for model_name, bucket, detail in results:
+            statuses[bucket] += 1
+            lines.append(f"[{bucket}] {model_name} -> {detail}")
 
         lines.append("-" * 40)
         lines.append(
@@ -193,8 +508,11 @@ class SomaTutor:
         return "\n".join(lines)
 
     def get_difficulty(self, topic: str) -> str:
-        data = load_progress()
-        score = data.get(normalize_topic(topic), 0)
+        row = progress_connection().execute(
+            "SELECT count FROM progress WHERE topic = ?",
+            (normalize_topic(topic),),
+        ).fetchone()
+        score = row[0] if row else 0
         if score > 5:
             return "easy"
         if score > 2:
@@ -205,102 +523,173 @@ class SomaTutor:
         topic_key = normalize_topic(topic)
         if not topic_key:
             return
-        data = load_progress()
-        data[topic_key] = data.get(topic_key, 0) + 1
-        save_progress(data)
+        progress_connection().execute(
+            "INSERT INTO progress(topic, count) VALUES (?, 1) "
+            "ON CONFLICT(topic) DO UPDATE SET count = count + 1",
+            (topic_key,),
+        )
+
+    def ask(self, topic: str, question: str) -> GenResult:
+        difficulty = self.get_difficulty(topic)
+        prompt = ASK_PROMPT_TEMPLATE.format(difficulty=difficulty, topic=topic, question=question)
+        return self.generate_cached(prompt)
 
-    def ask(self, topic: str, question: str) -> str:
+    def ask_stream(self, topic: str, question: str) -> Iterator[str]:
         difficulty = self.get_difficulty(topic)
-        prompt = f"""
-You are Soma AI, an adaptive learning tutor.
-
-Difficulty level: {difficulty}
-Topic: {topic}
-
-Explain clearly step-by-step.
-Use examples.
-Adjust depth based on difficulty.
-
-Question:
-{question}
-""".strip()
-        return self.generate(prompt)
-
-    def summarize(self, text: str) -> str:
-        prompt = f"""
-Convert this into structured bullet notes.
-Highlight key ideas, definitions, and examples.
-
-Text:
-{text}
-""".strip()
-        return self.generate(prompt)
-
-    def generate_quiz(self, topic: str) -> str:
-        prompt = f"""
-Create 5 university-level quiz questions.
-Provide answers at the end.
-
-Topic: {topic}
-""".strip()
-        return self.generate(prompt)
-
-    def _analyze_bytes(self, file_bytes: bytes, mime_type: str, prompt: str) -> str:
-        file_part = genai_types.Part.from_bytes(data=file_bytes, mime_type=mime_type)
+        prompt = ASK_PROMPT_TEMPLATE.format(difficulty=difficulty, topic=topic, question=question)
+        return self.generate_stream(prompt)
+
+    def summarize(self, text: str) -> GenResult:
+        return self.generate_cached(SUMMARIZE_PROMPT_TEMPLATE.format(text=text))
+
+    def generate_quiz(self, topic: str) -> GenResult:
+        return self.generate_cached(QUIZ_PROMPT_TEMPLATE.format(topic=topic))
+
+    def _generate_with_file(self, file_part: genai_types.Part, prompt: str) -> GenResult:
         text_part = genai_types.Part.from_text(text=prompt)
         contents = [genai_types.Content(role="user", parts=[file_part, text_part])]
         return self.generate(contents)
 
-    def analyze_image_bytes(self, image_bytes: bytes, mime_type: str) -> str:
-        prompt = (
-            "Analyze this photo in detail. Describe visible objects, setting, actions, "
-            "text in image, and notable visual cues. Then provide a structured summary."
+    def _media_cache_key(self, chunks: Iterable[bytes], mime_type: str, prompt: str) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        for chunk in chunks:
+            hasher.update(chunk)
+        hasher.update(b"\0" + mime_type.encode("utf-8"))
+        hasher.update(b"\0" + prompt.encode("utf-8"))
+        hasher.update(b"\0" + ",".join(self.model_candidates).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _cached_media_result(self, key: str, run: Callable[[], GenResult]) -> GenResult:
+        cached = self.media_cache.get(key)
+        if cached is not None:
+            return GenResult(text=cached, ok=True)
+        result = run()
+        if result.ok:
+            self.media_cache.set(key, result.text)
+        return result
+
+    def _analyze_bytes(self, file_bytes: bytes, mime_type: str, prompt: str) -> GenResult:
+        key = self._media_cache_key([file_bytes], mime_type, prompt)
+        return self._cached_media_result(
+            key,
+            lambda: self._generate_with_file(
+                genai_types.Part.from_bytes(data=file_bytes, mime_type=mime_type), prompt
+            ),
         )
-        return self._analyze_bytes(image_bytes, mime_type, prompt)
-
-    def transcribe_audio_bytes(self, audio_bytes: bytes, mime_type: str) -> str:
-        prompt = (
-            "Transcribe this lecture audio faithfully. Then provide:\n"
-            "1) clean transcript,\n"
-            "2) key points,\n"
-            "3) short revision summary,\n"
-            "4) 5 quiz questions."
+
+    def _analyze_file(self, file_obj: BinaryIO, mime_type: str, prompt: str) -> GenResult:
+        file_obj.seek(0)
+        key = self._media_cache_key(iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""), mime_type, prompt)
+        size = file_obj.tell()
+        file_obj.seek(0)
+        return self._cached_media_result(
+            key, lambda: self._analyze_file_uncached(file_obj, size, mime_type, prompt)
         )
-        return self._analyze_bytes(audio_bytes, mime_type, prompt)
 
-    def analyze_image(self, image_path: str) -> str:
-        clean_path = image_path.strip()
-        if not clean_path:
-            return "No image selected."
-        path = Path(clean_path)
-        if not path.exists():
-            return "Image file not found."
-        if not path.is_file():
-            return "Provided path is not a file."
+    def _analyze_file_uncached(self, file_obj: BinaryIO, size: int, mime_type: str, prompt: str) -> GenResult:
+        if size <= INLINE_UPLOAD_LIMIT:
+            file_part = genai_types.Part.from_bytes(data=file_obj.read(), mime_type=mime_type)
+            return self._generate_with_file(file_part, prompt)
         try:
-            data = path.read_bytes()
-        except PermissionError:
-            return "Permission denied while reading image."
+            uploaded = self.client.files.upload(
+                file=file_obj,
+                config=genai_types.UploadFileConfig(mime_type=mime_type),
+            )
         except Exception as exc:
-            return f"Could not read image: {exc}"
-        return self.analyze_image_bytes(data, pick_mime_type(path))
+            error_text = str(exc)
+            return api_error(error_text, self._classify_error(error_text))
+        try:
+            file_part = genai_types.Part.from_uri(file_uri=uploaded.uri, mime_type=mime_type)
+            return self._generate_with_file(file_part, prompt)
+        finally:
+            self._delete_upload(uploaded.name)
+
+    def _delete_upload(self, name: str) -> None:
+        try:
+            self.client.files.delete(name=name)
+        except Exception:
+            pass
+
+    def analyze_image_bytes(self, image_bytes: bytes, mime_type: str) -> GenResult:
+        return self._analyze_bytes(image_bytes, mime_type, IMAGE_ANALYSIS_PROMPT)
+
+    def transcribe_audio_bytes(self, audio_bytes: bytes, mime_type: str) -> GenResult:
+        return self._analyze_bytes(audio_bytes, mime_type, AUDIO_TRANSCRIPTION_PROMPT)
+
+    def analyze_image_file(self, file_obj: BinaryIO, mime_type: str) -> GenResult:
+        return self._analyze_file(file_obj, mime_type, IMAGE_ANALYSIS_PROMPT)
+
+    def transcribe_audio_file(self, file_obj: BinaryIO, mime_type: str) -> GenResult:
+        return self._analyze_file(file_obj, mime_type, AUDIO_TRANSCRIPTION_PROMPT)
 
-    def transcribe_audio(self, audio_path: str) -> str:
-        clean_path = audio_path.strip()
+    def _open_media(self, raw_path: str, label: str) -> Tuple[BinaryIO, str]:
+        clean_path = raw_path.strip()
         if not clean_path:
-            return "No audio selected."
-        path = Path(clean_path)
-        if not path.exists():
-            return "Audio file not found."
-        if not path.is_file():
-            return "Provided path is not a file."
+            raise MediaInputError(f"No {label} selected.")
         try:
-            data = path.read_bytes()
-        except PermissionError:
-            return "Permission denied while reading audio."
-        except Exception as exc:
-            return f"Could not read audio: {exc}"
-        return self.transcribe_audio_bytes(data, pick_mime_type(path))
+            fd = os.open(clean_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        except FileNotFoundError:
+            raise MediaInputError(f"{label.capitalize()} file not found.") from None
+        except IsADirectoryError:
+            raise MediaInputError("Provided path is not a file.") from None
+        except OSError as exc:
+            raise MediaInputError(self._read_error(exc, label)) from None
+        try:
+            is_file = stat.S_ISREG(os.fstat(fd).st_mode)
+        except OSError as exc:
+            os.close(fd)
+            raise MediaInputError(self._read_error(exc, label)) from None
+        if not is_file:
+            os.close(fd)
+            raise MediaInputError("Provided path is not a file.")
+        return os.fdopen(fd, "rb"), pick_mime_type(clean_path)
+
+    def _read_error(self, exc: Exception, label: str) -> str:
+        if isinstance(exc, PermissionError):
+            return f"Permission denied while reading {label}."
+        return f"Could not read {label}: {exc}"
+
+    def _input_error(self, detail: str) -> GenResult:
+        return GenResult(text=detail, ok=False, error_code="INPUT")
+
+    def _analyze_path(self, raw_path: str, label: str, prompt: str) -> GenResult:
+        try:
+            file_obj, mime_type = self._open_media(raw_path, label)
+        except MediaInputError as exc:
+            return self._input_error(str(exc))
+        try:
+            with file_obj:
+                return self._analyze_file(file_obj, mime_type, prompt)
+        except OSError as exc:
+            return self._input_error(self._read_error(exc, label))
+
+    def analyze_image(self, image_path: str) -> GenResult:
+        return self._analyze_path(image_path, "image", IMAGE_ANALYSIS_PROMPT)
+
+    def transcribe_audio(self, audio_path: str) -> GenResult:
+        return self._analyze_path(audio_path, "audio", AUDIO_TRANSCRIPTION_PROMPT)
+
+    def _batch_analyze(self, jobs: List[Callable[[], GenResult]]) -> List[GenResult]:
+        futures = [self._batch_executor.submit(job) for job in jobs]
+        return [future.result() for future in futures]
+
+    def _path_jobs(self, paths: List[str], label: str, prompt: str) -> List[Callable[[], GenResult]]:
+        return [functools.partial(self._analyze_path, p, label, prompt) for p in paths]
+
+    def _file_jobs(self, items: List[Tuple[BinaryIO, str]], prompt: str) -> List[Callable[[], GenResult]]:
+        return [functools.partial(self._analyze_file, f, m, prompt) for f, m in items]
+
+    def batch_analyze_images(self, paths: List[str]) -> List[GenResult]:
+        return self._batch_analyze(self._path_jobs(paths, "image", IMAGE_ANALYSIS_PROMPT))
+
+    def batch_transcribe_audio(self, paths: List[str]) -> List[GenResult]:
+        return self._batch_analyze(self._path_jobs(paths, "audio", AUDIO_TRANSCRIPTION_PROMPT))
+
+    def batch_analyze_image_files(self, items: List[Tuple[BinaryIO, str]]) -> List[GenResult]:
+        return self._batch_analyze(self._file_jobs(items, IMAGE_ANALYSIS_PROMPT))
+
+    def batch_transcribe_audio_files(self, items: List[Tuple[BinaryIO, str]]) -> List[GenResult]:
+        return self._batch_analyze(self._file_jobs(items, AUDIO_TRANSCRIPTION_PROMPT))
 
     def save_note(self, text: str) -> Path:
         filename = datetime.datetime.now().strftime("%Y%m%d_%H%M%S.txt")
@@ -308,10 +697,10 @@ Topic: {topic}
         path.write_text(text, encoding="utf-8")
         return path
 
-    def run_and_track(self, topic: str, fn) -> Tuple[str, Optional[Path]]:
+    def run_and_track(self, topic: str, fn, save: bool = False) -> Tuple[GenResult, Optional[Path]]:
         result = fn()
-        if is_api_error_text(result):
+        if not result.ok:
             return result, None
         self.update_progress(topic)
-        note = self.save_note(result)
+        note = self.save_note(result.text) if save else None
         return result, note
@@ -1,9 +1,9 @@
 from colorama import Fore, Style, init
 
 try:
-    from core import MODEL_CANDIDATES, SomaTutor, is_api_error_text
+    from core import MODEL_CANDIDATES, SomaTutor
 except ImportError:
-    from .core import MODEL_CANDIDATES, SomaTutor, is_api_error_text
+    from .core import MODEL_CANDIDATES, SomaTutor
 
 init(autoreset=True)
 
@@ -68,11 +68,11 @@ def main() -> None:
             question = input("Question: ").strip()
             print(Fore.CYAN + "\nThinking...\n")
             answer = tutor.ask(topic, question)
-            print(Fore.WHITE + answer)
-            if not is_api_error_text(answer):
+            print(Fore.WHITE + answer.text)
+            if answer.ok:
                 tutor.update_progress(topic)
                 if input("\nSave answer? (y/n): ").strip().lower() == "y":
-                    path = tutor.save_note(answer)
+                    path = tutor.save_note(answer.text)
                     print(Fore.GREEN + f"Saved to {path}")
             else:
                 print(Fore.RED + "\nRequest failed; progress not updated and response will not be saved.")
@@ -80,12 +80,12 @@ def main() -> None:
         elif choice == "2":
             text = input("Paste text:\n")
             print(Fore.CYAN + "\nProcessing...\n")
-            print(Fore.WHITE + tutor.summarize(text))
+            print(Fore.WHITE + tutor.summarize(text).text)
 
         elif choice == "3":
             topic = input("Quiz topic: ").strip()
             print(Fore.CYAN + "\nGenerating quiz...\n")
-            print(Fore.WHITE + tutor.generate_quiz(topic))
+            print(Fore.WHITE + tutor.generate_quiz(topic).text)
 
         elif choice == "4":
             print("a. Analyze image")
@@ -101,7 +101,7 @@ def main() -> None:
                         continue
                     print(Fore.CYAN + f"Selected: {path}")
                 print(Fore.CYAN + "\nAnalyzing image...\n")
-                print(Fore.WHITE + tutor.analyze_image(path))
+                print(Fore.WHITE + tutor.analyze_image(path).text)
             elif sub == "b":
                 path = input("Enter audio path (wav/mp3/m4a/aac/flac/ogg), or press Enter to browse: ").strip()
                 if not path:
@@ -111,7 +111,7 @@ def main() -> None:
                         continue
                     print(Fore.CYAN + f"Selected: {path}")
                 print(Fore.CYAN + "\nTranscribing audio...\n")
-                print(Fore.WHITE + tutor.transcribe_audio(path))
+                print(Fore.WHITE + tutor.transcribe_audio(path).text)
             else:
                 print(Fore.RED + "Invalid sub-option.")
 
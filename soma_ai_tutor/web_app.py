@@ -1,16 +1,22 @@
 import os
 
-from flask import Flask, redirect, render_template, request, url_for
+from flask import Flask, Response, redirect, render_template, request, stream_with_context, url_for
+from jinja2 import FileSystemBytecodeCache
 
 try:
-    from core import MODEL_CANDIDATES, SomaTutor, is_api_error_text, pick_mime_type
+    from core import DATA_DIR, MODEL_CANDIDATES, SomaTutor, pick_mime_type
 except ImportError:
-    from .core import MODEL_CANDIDATES, SomaTutor, is_api_error_text, pick_mime_type
+    from .core import DATA_DIR, MODEL_CANDIDATES, SomaTutor, pick_mime_type
 
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "soma-dev-secret")
 
+JINJA_CACHE_DIR = DATA_DIR / ".jinja_cache"
+JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=str(JINJA_CACHE_DIR))
+app.jinja_env.auto_reload = app.debug
+
 tutor = SomaTutor()
 
 
@@ -29,8 +35,9 @@ def ask_tutor():
         if not topic or not question:
             error = "Topic and question are required."
         else:
-            result = tutor.ask(topic, question)
-            if not is_api_error_text(result):
+            answer = tutor.ask(topic, question)
+            result = answer.text
+            if answer.ok:
                 tutor.update_progress(topic)
             else:
                 error = "Gemini request failed. Progress was not updated."
@@ -44,6 +51,37 @@ def ask_tutor():
     )
 
 
+def sse_event(data: str, event: str = "") -> str:
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_tutor_stream():
+    topic = request.form.get("topic", "").strip()
+    question = request.form.get("question", "").strip()
+
+    def events():
+        if not topic or not question:
+            yield sse_event("Topic and question are required.", "error")
+            return
+        try:
+            for piece in tutor.ask_stream(topic, question):
+                yield sse_event(piece)
+        except RuntimeError as exc:
+            yield sse_event(f"{exc}\nProgress was not updated.", "error")
+            return
+        tutor.update_progress(topic)
+        yield sse_event("", "done")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/summarize", methods=["GET", "POST"])
 def summarize():
     result = ""
@@ -53,7 +91,7 @@ def summarize():
         if not text:
             error = "Text is required."
         else:
-            result = tutor.summarize(text)
+            result = tutor.summarize(text).text
     return render_template(
         "page.html",
         active="summarize",
@@ -73,7 +111,7 @@ def quiz():
         if not topic:
             error = "Topic is required."
         else:
-            result = tutor.generate_quiz(topic)
+            result = tutor.generate_quiz(topic).text
     return render_template(
         "page.html",
         active="quiz",
@@ -94,12 +132,42 @@ def multimodal():
         if not upload or not upload.filename:
             error = "Please upload a file."
         else:
-            file_bytes = upload.read()
             mime_type = upload.mimetype or pick_mime_type(upload.filename)
             if mode == "audio":
-                result = tutor.transcribe_audio_bytes(file_bytes, mime_type)
+                result = tutor.transcribe_audio_file(upload.stream, mime_type).text
             else:
-                result = tutor.analyze_image_bytes(file_bytes, mime_type)
+                result = tutor.analyze_image_file(upload.stream, mime_type).text
+    return render_template(
+        "page.html",
+        active="multimodal",
+        title="Analyze Image / Transcribe Audio",
+        result=result,
+        error=error,
+        mode=mode,
+        model_candidates=MODEL_CANDIDATES,
+    )
+
+
+@app.route("/multimodal/batch", methods=["POST"])
+def multimodal_batch():
+    result = ""
+    error = ""
+    mode = request.form.get("mode", "image")
+    uploads = [f for f in request.files.getlist("files") if f and f.filename]
+    if not uploads:
+        error = "Please upload at least one file."
+    else:
+        items = [
+            (upload.stream, upload.mimetype or pick_mime_type(upload.filename))
+            for upload in uploads
+        ]
+        if mode == "audio":
+            results = tutor.batch_transcribe_audio_files(items)
+        else:
+            results = tutor.batch_analyze_image_files(items)
+        result = "\n\n".join(
+            f"== {upload.filename} ==\n{item.text}" for upload, item in zip(uploads, results)
+        )
     return render_template(
         "page.html",
         active="multimodal",
@@ -125,4 +193,5 @@ def check_access():
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Production: gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:5000 soma_ai_tutor.web_app:app
+    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)